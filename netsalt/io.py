@@ -1,8 +1,15 @@
 """input/output functions"""
 import pickle
+import warnings
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import yaml
+
+# the libyaml based loader and dumper are about ten times faster on long pump profiles
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
 
 
 def save_graph(graph, filename="graph.pkl"):
@@ -19,10 +26,30 @@ def load_graph(filename="graph.pkl"):
 
 def save_modes(modes_df, filename="results.h5"):
     """Save modes dataframe into hdf5."""
-    modes_df.to_hdf(filename, key="modes")
+    # the (data, D0) columns mix strings and floats, which pytables pickles
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+        modes_df.to_hdf(filename, key="modes")
     modes_df.to_csv(Path(filename).with_suffix(".csv"))
 
 
+def save_pump(pump, filename="pump_profile.yaml"):
+    """Save a pump profile, as a binary numpy file if filename ends with .npy, else in yaml."""
+    if Path(filename).suffix == ".npy":
+        np.save(filename, np.asarray(pump, dtype=float))
+    else:
+        with open(filename, "w") as yml:
+            yaml.dump(np.asarray(pump).tolist(), yml, Dumper=_YAML_DUMPER)
+
+
+def load_pump(filename="pump_profile.yaml"):
+    """Load a pump profile saved with save_pump."""
+    if Path(filename).suffix == ".npy":
+        return np.load(filename)
+    with open(filename, "r") as yml:
+        return np.array(yaml.load(yml, Loader=_YAML_LOADER))
+
+
 def load_modes(filename="results.h5"):
     """Return modes dataframe from hdf5."""
     return pd.read_hdf(filename, "modes")
@@ -3,7 +3,8 @@
 import logging
 import multiprocessing
 import warnings
-from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 
 import numpy as np
 import pandas as pd
@@ -20,18 +21,30 @@ from .quantum_graph import (
     construct_incidence_matrix,
     construct_laplacian,
     construct_weight_matrix,
+    get_phase_factors,
     set_wavenumber,
     mode_quality,
+    shift_invert_operator,
 )
 from .utils import from_complex, get_scan_grid, to_complex
 
-warnings.filterwarnings("ignore")
-# warnings.filterwarnings("error")
-
 L = logging.getLogger(__name__)
 
 # pylint: disable=too-many-locals
 
+_WORKER = None
+
+
+def _init_worker(worker):
+    """Set the worker of a pool process, so it is not sent with each task."""
+    global _WORKER  # pylint: disable=global-statement
+    _WORKER = worker
+
+
+def _call_worker(arg):
+    """Call the worker set in the pool process by _init_worker."""
+    return _WORKER(arg)
+
 
 class WorkerModes:
     """Worker to find modes."""
@@ -85,18 +98,24 @@ class WorkerScan:
     def __init__(self, graph, quality_method="eigenvalue"):
         self.graph = graph
         self.quality_method = quality_method
+        # a lower precision such as complex64 is enough to locate the modes
+        self.dtype = np.dtype(graph.graph["params"].get("scan_dtype", "complex128"))
         np.random.seed(42)
 
     def __call__(self, freq):
         return mode_quality(
-            to_complex(freq), self.graph, quality_method=self.quality_method
+            to_complex(freq),
+            self.graph,
+            quality_method=self.quality_method,
+            dtype=self.dtype,
         )
 
 
 def scan_frequencies(graph, quality_method="eigenvalue"):
     """Scan a range of complex frequencies and return mode qualities."""
     ks, alphas = get_scan_grid(graph)
-    freqs = [[k, a] for k in ks for a in alphas]
+    k_grid, alpha_grid = np.meshgrid(ks, alphas, indexing="ij")
+    freqs = np.column_stack([k_grid.ravel(), alpha_grid.ravel()])
 
     worker_scan = WorkerScan(graph, quality_method=quality_method)
 
@@ -106,22 +125,20 @@ def scan_frequencies(graph, quality_method="eigenvalue"):
         qualities_list = list(map(worker_scan, freqs))
     else:
         chunksize = max(1, int(0.1 * len(freqs) / graph.graph["params"]["n_workers"]))
-        with multiprocessing.Pool(graph.graph["params"]["n_workers"]) as pool:
+        with multiprocessing.Pool(
+            graph.graph["params"]["n_workers"],
+            initializer=_init_worker,
+            initargs=(worker_scan,),
+        ) as pool:
             qualities_list = list(
                 tqdm(
-                    pool.imap(worker_scan, freqs, chunksize=chunksize),
+                    pool.imap(_call_worker, freqs, chunksize=chunksize),
                     total=len(freqs),
                 )
             )
 
-    id_k = [k_i for k_i in range(len(ks)) for a_i in range(len(alphas))]
-    id_a = [a_i for k_i in range(len(ks)) for a_i in range(len(alphas))]
-    qualities = sc.sparse.coo_matrix(
-        (qualities_list, (id_k, id_a)),
-        shape=(graph.graph["params"]["k_n"], graph.graph["params"]["alpha_n"]),
-    ).toarray()
-
-    return qualities
+    # freqs runs over alphas first, so the qualities are in row-major order
+    return np.asarray(qualities_list, dtype=float).reshape(len(ks), len(alphas))
 
 
 def _init_dataframe():
@@ -132,6 +149,24 @@ def _init_dataframe():
     return pd.DataFrame(columns=indexes)
 
 
+def _add_data_columns(modes_df, data_name, data):
+    """Add the columns (data_name, D0) of a dict {D0: values} in a single concat.
+
+    Setting the columns one by one rebuilds the multiindex of modes_df each time.
+    Existing (data_name, D0) columns are replaced, and modes_df is left unchanged.
+    """
+    if data_name in modes_df:
+        modes_df = modes_df.drop(columns=data_name, level=0)
+    data_df = pd.DataFrame(
+        {D0: pd.Series(values, index=modes_df.index) for D0, values in data.items()},
+        index=modes_df.index,
+    )
+    data_df.columns = pd.MultiIndex.from_product(
+        [[data_name], data_df.columns], names=modes_df.columns.names
+    )
+    return pd.concat([modes_df, data_df], axis=1)
+
+
 def find_modes(
     graph, qualities, quality_method="eigenvalue", min_distance=2, threshold_abs=1.0
 ):
@@ -150,10 +185,15 @@ def find_modes(
     if n_workers == 1:
         refined_modes = list(map(worker_modes, range(len(estimated_modes))))
     else:
-        with multiprocessing.Pool(graph.graph["params"]["n_workers"]) as pool:
+        chunksize = max(1, int(0.1 * len(estimated_modes) / n_workers))
+        with multiprocessing.Pool(
+            n_workers, initializer=_init_worker, initargs=(worker_modes,)
+        ) as pool:
             refined_modes = list(
                 tqdm(
-                    pool.imap(worker_modes, range(len(estimated_modes))),
+                    pool.imap(
+                        _call_worker, range(len(estimated_modes)), chunksize=chunksize
+                    ),
                     total=len(estimated_modes),
                 )
             )
@@ -191,10 +231,7 @@ def find_modes(
 
 def _convert_edges(vector):
     """Convert single edge values to double edges."""
-    edge_vector = np.zeros(2 * len(vector), dtype=np.complex128)
-    edge_vector[::2] = vector
-    edge_vector[1::2] = vector
-    return edge_vector
+    return np.repeat(np.asarray(vector, dtype=np.complex128), 2)
 
 
 def _get_dielectric_constant_matrix(params):
@@ -217,25 +254,35 @@ def _graph_norm(BT, Bout, Winv, z_matrix, node_solution, mask):
     return norm
 
 
+@lru_cache(maxsize=8)
+def _z_matrix_pattern(m):
+    """CSC indices and indptr of the Z matrix of a graph with m edges.
+
+    Z is made of 2x2 diagonal blocks, each column has two entries and no duplicates,
+    so we set the CSC structure directly instead of converting from COO. The arrays
+    are shared between calls and are read-only.
+    """
+    indptr = np.arange(0, 4 * m + 1, 2, dtype=np.int32)
+    indices = np.empty(4 * m, dtype=np.int32)
+    indices[0::2] = 2 * np.arange(m).repeat(2)
+    indices[1::2] = indices[0::2] + 1
+    indices.flags.writeable = False
+    indptr.flags.writeable = False
+    return indices, indptr
+
+
 def compute_z_matrix(graph):
     """Construct the matrix Z used for computing the pump overlapping factor."""
-    data_diag = (np.exp(2.0j * graph.graph["lengths"] * graph.graph["ks"]) - 1.0) / (
-        2.0j * graph.graph["ks"]
-    )
-    data_off_diag = graph.graph["lengths"] * np.exp(
-        1.0j * graph.graph["lengths"] * graph.graph["ks"]
-    )
-    data = np.dstack([data_diag, data_diag, data_off_diag, data_off_diag]).flatten()
+    m = len(graph.graph["lengths"])
+    phase_factors = get_phase_factors(graph)
+    data = np.empty(4 * m, dtype=np.complex128)
+    data[0::4] = phase_factors * (phase_factors + 2.0) / (2.0j * graph.graph["ks"])
+    data[1::4] = graph.graph["lengths"] * (phase_factors + 1.0)
+    data[2::4] = data[1::4]
+    data[3::4] = data[0::4]
 
-    m = len(graph.edges)
-    edge_ids = np.arange(m)
-    row = np.dstack(
-        [2 * edge_ids, 2 * edge_ids + 1, 2 * edge_ids, 2 * edge_ids + 1]
-    ).flatten()
-    col = np.dstack(
-        [2 * edge_ids, 2 * edge_ids + 1, 2 * edge_ids + 1, 2 * edge_ids]
-    ).flatten()
-    return sc.sparse.csc_matrix((data, (col, row)), shape=(2 * m, 2 * m))
+    indices, indptr = _z_matrix_pattern(m)
+    return sc.sparse.csc_matrix((data, indices, indptr), shape=(2 * m, 2 * m))
 
 
 def compute_overlapping_single_edges(passive_mode, graph):
@@ -255,15 +302,12 @@ def compute_overlapping_single_edges(passive_mode, graph):
         BT, Bout, Winv, z_matrix, node_solution, inner_dielectric_constants
     )
 
-    pump_norm = np.zeros(len(graph.edges), dtype=np.complex128)
-    for pump_edge, inner in enumerate(graph.graph["params"]["inner"]):
-        if inner:
-            mask = np.zeros(len(graph.edges))
-            mask[pump_edge] = 1.0
-            pump_mask = sc.sparse.diags(_convert_edges(mask))
-            pump_norm[pump_edge] = _graph_norm(
-                BT, Bout, Winv, z_matrix, node_solution, pump_mask
-            )
+    # the graph norm with a single edge mask only sums the two entries of this edge
+    # in (node_solution^T BT Winv Z Winv) * (Bout node_solution), for all edges at once
+    left_vector = Winv.dot(z_matrix).dot(Winv).T.dot(BT.T.dot(node_solution))
+    right_vector = Bout.dot(node_solution)
+    pump_norm = (left_vector * right_vector).reshape(-1, 2).sum(axis=1)
+    pump_norm[~np.asarray(graph.graph["params"]["inner"], dtype=bool)] = 0.0
 
     return np.real(pump_norm / inner_norm)
 
@@ -289,10 +333,15 @@ def compute_overlapping_factor(passive_mode, graph):
     return pump_norm / inner_norm
 
 
-def pump_linear(mode_0, graph, D0_0, D0_1):
-    """Find the linear approximation of the new wavenumber."""
+def pump_linear(mode_0, graph, D0_0, D0_1, overlapping_factor=None):
+    """Find the linear approximation of the new wavenumber.
+
+    If the overlapping factor of mode_0 at D0_0 is already known, it can be passed as
+    overlapping_factor to avoid solving for the mode again.
+    """
     graph.graph["params"]["D0"] = D0_0
-    overlapping_factor = compute_overlapping_factor(mode_0, graph)
+    if overlapping_factor is None:
+        overlapping_factor = compute_overlapping_factor(mode_0, graph)
     freq = to_complex(mode_0)
     gamma_overlap = gamma(freq, graph.graph["params"]) * overlapping_factor
     return from_complex(
@@ -300,24 +349,53 @@ def pump_linear(mode_0, graph, D0_0, D0_1):
     )
 
 
+def _smallest_eigenpair(laplacian, v0, max_iter=10, tol=1e-13):
+    """Return the eigenvalue of the laplacian closest to zero and its unit eigenvector.
+
+    Near a mode this eigenvalue is well separated from the others, so an inverse
+    iteration with a single LU factorisation converges in a few solves. If it does not
+    converge, we fall back to arpack in shift-invert mode, with the same factorisation.
+    """
+    lu = sc.sparse.linalg.splu(sc.sparse.csc_matrix(laplacian))
+    laplacian_norm = sc.sparse.linalg.norm(laplacian, 1)
+    vector = v0 / np.linalg.norm(v0)
+    for _ in range(max_iter):
+        vector = lu.solve(vector)
+        vector /= np.linalg.norm(vector)
+        l_vector = laplacian.dot(vector)
+        eigenvalue = np.vdot(vector, l_vector)
+        if np.linalg.norm(l_vector - eigenvalue * vector) < tol * laplacian_norm:
+            return eigenvalue, vector
+
+    eigenvalues, vectors = sc.sparse.linalg.eigs(
+        laplacian,
+        k=1,
+        sigma=0,
+        OPinv=shift_invert_operator(laplacian, lu=lu),
+        v0=v0,
+        which="LM",
+    )
+    return eigenvalues[0], vectors[:, 0]
+
+
 def mode_on_nodes(mode, graph):
     """Compute the mode solution on the nodes of the graph."""
     laplacian = construct_laplacian(to_complex(mode), graph)
-    min_eigenvalue, node_solution = sc.sparse.linalg.eigs(
-        laplacian, k=1, sigma=0, v0=np.ones(len(graph)), which="LM"
+    min_eigenvalue, node_solution = _smallest_eigenpair(
+        laplacian, np.ones(len(graph), dtype=np.complex128)
     )
     quality_thresh = graph.graph["params"].get("quality_threshold", 1e-4)
-    if abs(min_eigenvalue[0]) > 10 * quality_thresh:
+    if abs(min_eigenvalue) > 10 * quality_thresh:
         raise Exception(
             "Not a mode, as quality is too high: "
-            + str(abs(min_eigenvalue[0]))
+            + str(abs(min_eigenvalue))
             + " > "
             + str(10 * quality_thresh)
             + ", mode: "
             + str(mode)
         )
 
-    return node_solution[:, 0]
+    return node_solution
 
 
 def flux_on_edges(mode, graph):
@@ -335,30 +413,24 @@ def mean_mode_on_edges(mode, graph):
     r"""Compute the average :math:`Real(E^2)` on each edge."""
     edge_flux = flux_on_edges(mode, graph)
 
-    mean_edge_solution = np.zeros(len(graph.edges))
-    for ei in range(len(graph.edges)):
-        k = 1.0j * graph.graph["ks"][ei]
-        length = graph.graph["lengths"][ei]
-        z = np.zeros([2, 2], dtype=np.complex128)
-
-        if abs(np.real(k)) > 0:  # in case we deal with closed graph, we have 0 / 0
-            z[0, 0] = (np.exp(length * (k + np.conj(k))) - 1.0) / (
-                length * (k + np.conj(k))
-            )
-        else:
-            z[0, 0] = 1.0
-            z[1, 1] = 1.0
-        z[0, 1] = (np.exp(length * k) - np.exp(length * np.conj(k))) / (
-            length * (k - np.conj(k))
-        )
-        z[1, 0] = z[0, 1]
-        z[1, 1] = z[0, 0]
+    ks = 1.0j * graph.graph["ks"]
+    lengths = graph.graph["lengths"]
+    flux_plus, flux_minus = edge_flux[::2], edge_flux[1::2]
+
+    # in case we deal with closed graph, we have 0 / 0 and the diagonal is 1
+    z_diag = np.ones(len(ks), dtype=np.complex128)
+    open_edges = abs(np.real(ks)) > 0
+    lk_sum = lengths[open_edges] * (ks[open_edges] + np.conj(ks[open_edges]))
+    z_diag[open_edges] = np.expm1(lk_sum) / lk_sum
+    z_off_diag = (np.exp(lengths * ks) - np.exp(lengths * np.conj(ks))) / (
+        lengths * (ks - np.conj(ks))
+    )
 
-        mean_edge_solution[ei] = np.abs(
-            edge_flux[2 * ei : 2 * ei + 2].T.dot(
-                z.dot(np.conj(edge_flux[2 * ei : 2 * ei + 2]))
-            )
-        )
+    mean_edge_solution = np.abs(
+        z_diag * (abs(flux_plus) ** 2 + abs(flux_minus) ** 2)
+        + z_off_diag
+        * (flux_plus * np.conj(flux_minus) + flux_minus * np.conj(flux_plus))
+    )
 
     return mean_edge_solution
 
@@ -373,7 +445,7 @@ def mean_mode_E4_on_edges(mode, graph):
         length = graph.graph["lengths"][ei]
         z = np.zeros([4, 4], dtype=np.complex128)
 
-        z[0, 0] = (np.exp(2.0j * length * (k - np.conj(k))) - 1.0) / (
+        z[0, 0] = np.expm1(2.0j * length * (k - np.conj(k))) / (
             2.0j * length * (k - np.conj(k))
         )
         z[1, 1] = (np.exp(2.0j * length * k) - np.exp(-2.0j * length * np.conj(k))) / (
@@ -470,103 +542,98 @@ def _precomputations_mode_competition(graph, pump_mask, mode_threshold):
     Winv = construct_weight_matrix(graph, with_k=False)
     pump_norm = _graph_norm(BT, Bout, Winv, z_matrix, node_solution, pump_mask)
 
-    edge_flux = flux_on_edges(mode, graph) / np.sqrt(pump_norm)
+    # same as flux_on_edges, without solving for the mode a second time
+    edge_flux = Winv.dot(Bout).dot(node_solution) / np.sqrt(pump_norm)
     k_mu = graph.graph["ks"]
     gam = gamma(to_complex(mode), graph.graph["params"])
 
     return k_mu, edge_flux, gam
 
 
-def _compute_mode_competition_element(lengths, params, data, with_gamma=True):
-    """Computes a single element of the mode competition matrix."""
-    mu_data, nu_data, gamma_nu = data
-    k_mus, edge_flux_mu = mu_data
-    k_nus, edge_flux_nu = nu_data
-
-    matrix_element = 0
-    for ei, length in enumerate(lengths):
-        if params["pump"][ei] > 0.0 and params["inner"][ei]:
-            k_mu = k_mus[ei]
-            k_nu = k_nus[ei]
-
-            inner_matrix = np.zeros([4, 4], dtype=np.complex128)
-
-            # A terms
-            ik_tmp = 1.0j * (k_nu - np.conj(k_nu) + 2.0 * k_mu)
-            inner_matrix[0, 0] = inner_matrix[3, 3] = (
-                np.exp(ik_tmp * length) - 1.0
-            ) / ik_tmp
-
-            # B terms
-            ik_tmp = 1.0j * (k_nu - np.conj(k_nu) - 2.0 * k_mu)
-            inner_matrix[0, 3] = inner_matrix[3, 0] = (
-                np.exp(2.0j * k_mu * length) * (np.exp(ik_tmp * length) - 1.0) / ik_tmp
-            )
-
-            # C terms
-            ik_tmp = 1.0j * (k_nu + np.conj(k_nu) + 2.0 * k_mu)
-            inner_matrix[1, 0] = inner_matrix[2, 3] = (
-                np.exp(1.0j * (k_nu + 2.0 * k_mu) * length)
-                - np.exp(-1.0j * np.conj(k_nu) * length)
-            ) / ik_tmp
-
-            # D terms
-            ik_tmp = 1.0j * (k_nu + np.conj(k_nu) - 2.0 * k_mu)
-            inner_matrix[1, 3] = inner_matrix[2, 0] = (
-                np.exp(1.0j * k_nu * length)
-                - np.exp(1.0j * (2.0 * k_mu - np.conj(k_nu)) * length)
-            ) / ik_tmp
-
-            # E terms
-            ik_tmp = 1.0j * (k_nu - np.conj(k_nu))
-            inner_matrix[0, 1] = inner_matrix[0, 2] = inner_matrix[3, 1] = inner_matrix[
-                3, 2
-            ] = (
-                np.exp(1.0j * k_mu * length) * (np.exp(ik_tmp * length) - 1.0) / ik_tmp
-            )
+def _compute_mode_competition_row(lengths, params, nu_data, mu_data, with_gamma=True):
+    """Computes a row of the mode competition matrix.
 
-            # F terms
-            ik_tmp = 1.0j * (k_nu + np.conj(k_nu))
-            inner_matrix[1, 1] = inner_matrix[1, 2] = inner_matrix[2, 1] = inner_matrix[
-                2, 2
-            ] = (
-                np.exp(1.0j * k_mu * length)
-                * (
-                    np.exp(1.0j * k_nu * length)
-                    - np.exp(-1.0j * np.conj(k_nu) * length)
-                )
-                / ik_tmp
-            )
-
-            # left vector
-            flux_nu_plus = edge_flux_nu[2 * ei]
-            flux_nu_minus = edge_flux_nu[2 * ei + 1]
-            left_vector = np.array(
-                [
-                    abs(flux_nu_plus) ** 2,
-                    flux_nu_plus * np.conj(flux_nu_minus),
-                    np.conj(flux_nu_plus) * flux_nu_minus,
-                    abs(flux_nu_minus) ** 2,
-                ]
-            )
+    Args:
+        lengths (array): edge lengths
+        params (dict): graph parameters, with pump and inner edges
+        nu_data (tuple): wavenumbers, edge fluxes and gammas of all modes, stacked
+        mu_data (tuple): wavenumbers and edge fluxes of the mode of this row
+        with_gamma (bool): multiply the elements by the imaginary part of gamma
+    """
+    k_mus, edge_flux_mu = mu_data
+    k_nus, edge_flux_nu, gamma_nu = nu_data
 
-            # right vector
-            flux_mu_plus = edge_flux_mu[2 * ei]
-            flux_mu_minus = edge_flux_mu[2 * ei + 1]
-            right_vector = np.array(
-                [
-                    flux_mu_plus**2,
-                    flux_mu_plus * flux_mu_minus,
-                    flux_mu_plus * flux_mu_minus,
-                    flux_mu_minus**2,
-                ]
-            )
+    pumped_edges = np.flatnonzero(
+        (np.asarray(params["pump"]) > 0.0) & np.asarray(params["inner"], dtype=bool)
+    )
+    lengths = np.asarray(lengths)[pumped_edges]
+    k_mu = k_mus[pumped_edges]
+    k_nu = k_nus[:, pumped_edges]
+
+    # the inner matrix has the structure
+    # [[A, E, E, B], [C, F, F, D], [D, F, F, C], [B, E, E, A]]
+    # A terms
+    ik_tmp = 1.0j * (k_nu - np.conj(k_nu) + 2.0 * k_mu)
+    a_term = (np.exp(ik_tmp * lengths) - 1.0) / ik_tmp
+
+    # B terms
+    ik_tmp = 1.0j * (k_nu - np.conj(k_nu) - 2.0 * k_mu)
+    b_term = np.exp(2.0j * k_mu * lengths) * (np.exp(ik_tmp * lengths) - 1.0) / ik_tmp
+
+    # C terms
+    ik_tmp = 1.0j * (k_nu + np.conj(k_nu) + 2.0 * k_mu)
+    c_term = (
+        np.exp(1.0j * (k_nu + 2.0 * k_mu) * lengths)
+        - np.exp(-1.0j * np.conj(k_nu) * lengths)
+    ) / ik_tmp
+
+    # D terms
+    ik_tmp = 1.0j * (k_nu + np.conj(k_nu) - 2.0 * k_mu)
+    d_term = (
+        np.exp(1.0j * k_nu * lengths)
+        - np.exp(1.0j * (2.0 * k_mu - np.conj(k_nu)) * lengths)
+    ) / ik_tmp
+
+    # E terms
+    ik_tmp = 1.0j * (k_nu - np.conj(k_nu))
+    e_term = np.exp(1.0j * k_mu * lengths) * (np.exp(ik_tmp * lengths) - 1.0) / ik_tmp
+
+    # F terms
+    ik_tmp = 1.0j * (k_nu + np.conj(k_nu))
+    f_term = (
+        np.exp(1.0j * k_mu * lengths)
+        * (np.exp(1.0j * k_nu * lengths) - np.exp(-1.0j * np.conj(k_nu) * lengths))
+        / ik_tmp
+    )
 
-            matrix_element += left_vector.dot(inner_matrix.dot(right_vector))
+    # left vector
+    flux_nu_plus = edge_flux_nu[:, 2 * pumped_edges]
+    flux_nu_minus = edge_flux_nu[:, 2 * pumped_edges + 1]
+
+    # right vector, its second and third entries are equal and summed in right_12
+    flux_mu_plus = edge_flux_mu[2 * pumped_edges]
+    flux_mu_minus = edge_flux_mu[2 * pumped_edges + 1]
+    right_0 = flux_mu_plus**2
+    right_12 = 2.0 * flux_mu_plus * flux_mu_minus
+    right_3 = flux_mu_minus**2
+
+    # product of the inner matrix with the right vector
+    inner_right_0 = a_term * right_0 + e_term * right_12 + b_term * right_3
+    inner_right_1 = c_term * right_0 + f_term * right_12 + d_term * right_3
+    inner_right_2 = d_term * right_0 + f_term * right_12 + c_term * right_3
+    inner_right_3 = b_term * right_0 + e_term * right_12 + a_term * right_3
+
+    matrix_row = np.sum(
+        abs(flux_nu_plus) ** 2 * inner_right_0
+        + flux_nu_plus * np.conj(flux_nu_minus) * inner_right_1
+        + np.conj(flux_nu_plus) * flux_nu_minus * inner_right_2
+        + abs(flux_nu_minus) ** 2 * inner_right_3,
+        axis=1,
+    )
 
     if with_gamma:
-        return -matrix_element * np.imag(gamma_nu)
-    return matrix_element
+        return -matrix_row * np.imag(gamma_nu)
+    return matrix_row
 
 
 def compute_mode_competition_matrix(graph, modes_df, with_gamma=True):
@@ -587,14 +654,14 @@ def compute_mode_competition_matrix(graph, modes_df, with_gamma=True):
     if n_workers == 1:
         precomp_results = list(map(precomp, zip(threshold_modes, lasing_thresholds)))
     else:
-        chunksize = max(
-            1, int(0.1 * len(lasing_thresholds) / graph.graph["params"]["n_workers"])
-        )
-        with multiprocessing.Pool(graph.graph["params"]["n_workers"]) as pool:
+        chunksize = max(1, int(0.1 * len(lasing_thresholds) / n_workers))
+        with multiprocessing.Pool(
+            n_workers, initializer=_init_worker, initargs=(precomp,)
+        ) as pool:
             precomp_results = list(
                 tqdm(
                     pool.imap(
-                        precomp,
+                        _call_worker,
                         zip(threshold_modes, lasing_thresholds),
                         chunksize=chunksize,
                     ),
@@ -602,61 +669,28 @@ def compute_mode_competition_matrix(graph, modes_df, with_gamma=True):
                 )
             )
 
-    input_data = []
-    for mu in range(len(threshold_modes)):
-        for nu in range(len(threshold_modes)):
-            input_data.append(
-                [
-                    precomp_results[mu][:2],
-                    precomp_results[nu][:2],
-                    precomp_results[nu][2],
-                ]
-            )
+    # each row is computed at once for all modes nu, broadcasting over the stacked data
+    nu_data = tuple(np.array(data) for data in zip(*precomp_results))
+    input_data = (precomp_result[:2] for precomp_result in precomp_results)
+    compute_row = partial(
+        _compute_mode_competition_row,
+        graph.graph["lengths"],
+        graph.graph["params"],
+        nu_data,
+        with_gamma=with_gamma,
+    )
 
-    n_workers = graph.graph["params"]["n_workers"]
     if n_workers == 1:
-        output_data = list(
-            map(
-                partial(
-                    _compute_mode_competition_element,
-                    graph.graph["lengths"],
-                    graph.graph["params"],
-                    with_gamma=with_gamma,
-                ),
-                input_data,
-            ),
-        )
+        output_data = list(map(compute_row, input_data))
     else:
-        chunksize = max(
-            1, int(0.1 * len(input_data) / graph.graph["params"]["n_workers"])
-        )
-        with multiprocessing.Pool(graph.graph["params"]["n_workers"]) as pool:
+        # the rows only do numpy arithmetic on the shared precomputed fluxes, so
+        # threads avoid pickling them for every mode
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
             output_data = list(
-                tqdm(
-                    pool.imap(
-                        partial(
-                            _compute_mode_competition_element,
-                            graph.graph["lengths"],
-                            graph.graph["params"],
-                            with_gamma=with_gamma,
-                        ),
-                        input_data,
-                        chunksize=chunksize,
-                    ),
-                    total=len(input_data),
-                )
+                tqdm(executor.map(compute_row, input_data), total=len(precomp_results))
             )
 
-    mode_competition_matrix = np.zeros(
-        [len(threshold_modes), len(threshold_modes)], dtype=np.complex128
-    )
-    index = 0
-    for mu in range(len(threshold_modes)):
-        for nu in range(len(threshold_modes)):
-            mode_competition_matrix[mu, nu] = output_data[index]
-            index += 1
-
-    # pool.close()
+    mode_competition_matrix = np.array(output_data, dtype=np.complex128)
 
     mode_competition_matrix_full = np.zeros(
         [
@@ -676,34 +710,33 @@ def _find_next_lasing_mode(
     lasing_thresholds,
     lasing_mode_ids,
     mode_competition_matrix,
+    *,
+    mode_competition_matrix_inv,
 ):
-    """Find next interacting lasing mode."""
-    interacting_lasing_thresholds = np.ones(len(modes_df)) * np.inf
-    for mu in modes_df.index:
-        if mu not in lasing_mode_ids:
-            sub_mode_comp_matrix_mu = mode_competition_matrix[
-                np.ix_(lasing_mode_ids + [mu], lasing_mode_ids)
-            ]
-            sub_mode_comp_matrix_inv = np.linalg.pinv(
-                mode_competition_matrix[np.ix_(lasing_mode_ids, lasing_mode_ids)]
-            )
-            sub_mode_comp_matrix_mu_inv = sub_mode_comp_matrix_mu[-1, :].dot(
-                sub_mode_comp_matrix_inv
-            )
+    """Find next interacting lasing mode.
 
-            factor = (1.0 - sub_mode_comp_matrix_mu_inv.sum()) / (
-                1.0
-                - lasing_thresholds[mu]
-                * sub_mode_comp_matrix_mu_inv.dot(
-                    1.0 / lasing_thresholds[lasing_mode_ids]
-                )
-            )
-            _int_thresh = lasing_thresholds[mu] * factor
-            if (
-                _int_thresh > pump_intensity
-                and _int_thresh > modes_df.loc[mu, "lasing_thresholds"].to_list()[0]
-            ):
-                interacting_lasing_thresholds[mu] = _int_thresh
+    The inverse of the mode competition matrix restricted to the lasing modes does not
+    depend on the candidate mode, so it is computed once by the caller, and all the
+    candidate modes are treated at once.
+    """
+    interacting_lasing_thresholds = np.ones(len(modes_df)) * np.inf
+    mode_ids = modes_df.index.to_numpy()
+    candidate_ids = mode_ids[~np.isin(mode_ids, lasing_mode_ids)]
+    thresholds = lasing_thresholds.to_numpy()
+
+    sub_mode_comp_matrix_inv = mode_competition_matrix[
+        np.ix_(candidate_ids, lasing_mode_ids)
+    ].dot(mode_competition_matrix_inv)
+    # modes without a lasing threshold give nan here, which are never selected
+    with np.errstate(invalid="ignore", divide="ignore"):
+        factors = (1.0 - sub_mode_comp_matrix_inv.sum(axis=1)) / (
+            1.0
+            - thresholds[candidate_ids]
+            * sub_mode_comp_matrix_inv.dot(1.0 / thresholds[lasing_mode_ids])
+        )
+        _int_thresh = thresholds[candidate_ids] * factors
+    new_ids = (_int_thresh > pump_intensity) & (_int_thresh > thresholds[candidate_ids])
+    interacting_lasing_thresholds[candidate_ids[new_ids]] = _int_thresh[new_ids]
 
     next_lasing_mode_id = np.argmin(interacting_lasing_thresholds)
     next_lasing_threshold = interacting_lasing_thresholds[next_lasing_mode_id]
@@ -712,7 +745,11 @@ def _find_next_lasing_mode(
 
 # pylint: disable=too-many-statements
 def compute_modal_intensities(modes_df, max_pump_intensity, mode_competition_matrix):
-    """Compute the modal intensities of the modes up to D0, with D0_steps."""
+    """Compute the modal intensities of the modes up to D0, with D0_steps.
+
+    The columns are added to a new dataframe, which must be used: modes_df is not
+    modified.
+    """
     lasing_thresholds = modes_df["lasing_thresholds"]
 
     next_lasing_mode_id = np.argmin(lasing_thresholds)
@@ -759,6 +796,7 @@ def compute_modal_intensities(modes_df, max_pump_intensity, mode_competition_mat
             lasing_thresholds,
             lasing_mode_ids,
             mode_competition_matrix,
+            mode_competition_matrix_inv=mode_competition_matrix_inv,
         )
         L.debug("Next lasing threshold %s", next_lasing_threshold)
 
@@ -802,16 +840,18 @@ def compute_modal_intensities(modes_df, max_pump_intensity, mode_competition_mat
                 modal_intensities.loc[vanishing_mode_id, pump_intensity] = 0
             del lasing_mode_ids[mode_id]
 
+    modes_df = modes_df.copy()
     modes_df["interacting_lasing_thresholds"] = interacting_lasing_thresholds
 
-    if "modal_intensities" in modes_df:
-        del modes_df["modal_intensities"]
-
+    # we force to be of given precision for stability
+    rounded_modal_intensities = {}
     for pump_intensity in modal_intensities:
-        # we force to be of given precision for stability
-        modes_df["modal_intensities", np.around(pump_intensity, 8)] = modal_intensities[
+        rounded_modal_intensities[np.around(pump_intensity, 8)] = modal_intensities[
             pump_intensity
-        ]
+        ].to_numpy()
+    modes_df = _add_data_columns(
+        modes_df, "modal_intensities", rounded_modal_intensities
+    )
     L.info(
         "%s lasing modes out of %s",
         len(np.where(modal_intensities.to_numpy()[:, -1] > 0)[0]),
@@ -820,10 +860,26 @@ def compute_modal_intensities(modes_df, max_pump_intensity, mode_competition_mat
     return modes_df
 
 
+def _pump_step(mode, graph=None, D0_0=0.0, D0_1=0.0, quality_method="eigenvalue"):
+    """Internal function for multiprocessing.
+
+    Linear approximation of a mode from D0_0 to D0_1, and its refinement at D0_1.
+    """
+    mode_approx = pump_linear(mode, graph, D0_0, D0_1)
+    worker_modes = WorkerModes(
+        [mode_approx], graph, D0s=[D0_1], quality_method=quality_method
+    )
+    return mode_approx, worker_modes(0)
+
+
 def pump_trajectories(
     modes_df, graph, return_approx=False, quality_method="eigenvalue"
 ):
-    """For a sequence of D0s, find the mode positions of the modes modes."""
+    """For a sequence of D0s, find the mode positions of the modes modes.
+
+    The columns are added to a new dataframe, which must be used: modes_df is not
+    modified.
+    """
 
     D0s = np.linspace(
         0,
@@ -842,45 +898,54 @@ def pump_trajectories(
             str(len(D0s) - 1),
             str(D0s[d + 1]),
         )
-        pumped_modes_approx.append(pumped_modes[-1].copy())
-        for m in range(n_modes):
-            pumped_modes_approx[-1][m] = pump_linear(
-                pumped_modes[-1][m], graph, D0s[d], D0s[d + 1]
-            )
-
-        worker_modes = WorkerModes(
-            pumped_modes_approx[-1],
-            graph,
-            D0s=n_modes * [D0s[d + 1]],
+        worker_pump_step = partial(
+            _pump_step,
+            graph=graph,
+            D0_0=D0s[d],
+            D0_1=D0s[d + 1],
             quality_method=quality_method,
         )
 
         n_workers = graph.graph["params"]["n_workers"]
         if n_workers == 1:
-            pumped_modes.append(list(map(worker_modes, range(n_modes))))
+            step_modes = list(map(worker_pump_step, pumped_modes[-1]))
         else:
-            with multiprocessing.Pool(graph.graph["params"]["n_workers"]) as pool:
-                pumped_modes.append(
-                    list(tqdm(pool.imap(worker_modes, range(n_modes)), total=n_modes))
+            chunksize = max(1, int(0.1 * n_modes / n_workers))
+            with multiprocessing.Pool(
+                n_workers, initializer=_init_worker, initargs=(worker_pump_step,)
+            ) as pool:
+                step_modes = list(
+                    tqdm(
+                        pool.imap(_call_worker, pumped_modes[-1], chunksize=chunksize),
+                        total=n_modes,
+                    )
                 )
+        pumped_modes_approx.append([mode_approx for mode_approx, _ in step_modes])
+        pumped_modes.append([mode for _, mode in step_modes])
 
         for i, mode in enumerate(pumped_modes[-1]):
             if mode is None:
                 L.info("Mode not be updated, consider changing the search parameters.")
                 pumped_modes[-1][i] = pumped_modes[-2][i]
 
-    if "mode_trajectories" in modes_df:
-        del modes_df["mode_trajectories"]
-    for D0, pumped_mode in zip(D0s, pumped_modes):
-        modes_df["mode_trajectories", D0] = [to_complex(mode) for mode in pumped_mode]
+    modes_df = _add_data_columns(
+        modes_df,
+        "mode_trajectories",
+        {
+            D0: [to_complex(mode) for mode in pumped_mode]
+            for D0, pumped_mode in zip(D0s, pumped_modes)
+        },
+    )
 
     if return_approx:
-        if "mode_trajectories_approx" in modes_df:
-            del modes_df["mode_trajectories_approx"]
-        for D0, pumped_mode_approx in zip(D0s, pumped_modes_approx):
-            modes_df["mode_trajectories_approx", D0] = [
-                to_complex(mode) for mode in pumped_mode_approx
-            ]
+        modes_df = _add_data_columns(
+            modes_df,
+            "mode_trajectories_approx",
+            {
+                D0: [to_complex(mode) for mode in pumped_mode_approx]
+                for D0, pumped_mode_approx in zip(D0s, pumped_modes_approx)
+            },
+        )
 
     return modes_df
 
@@ -891,21 +956,7 @@ def _get_new_D0(arg, graph=None, D0_steps=0.1, new_D0_method="linear_approx"):
     mode_id, new_mode, D0, mode_history = arg
     new_mode_state = mode_history["state"]
 
-    if new_D0_method == "standard":
-        np.random.seed(42)
-        increment = lasing_threshold_linear(new_mode, graph, D0)
-
-        if np.abs(increment) <= D0_steps:
-            new_D0 = D0 + increment
-
-        else:
-            new_D0 = D0 + D0_steps * np.sign(increment)
-
-        # L.debug("Mode %s at intensity %s", mode_id, new_D0)
-        new_modes_approx = pump_linear(new_mode, graph, D0, new_D0)
-        return mode_id, new_D0, new_modes_approx, new_mode_state
-
-    elif new_D0_method == "linear_approx":
+    if new_D0_method == "linear_approx":
         trajectory, D0s = mode_history["trajectory"], mode_history["D0s"]
 
         if trajectory[-1][1] < 0:
@@ -917,18 +968,29 @@ def _get_new_D0(arg, graph=None, D0_steps=0.1, new_D0_method="linear_approx"):
         new_modes_approx = pump_linear(new_mode, graph, D0, new_D0)
         return mode_id, new_D0, new_modes_approx, new_mode_state
 
-    elif new_D0_method == "first_guess":
-        increment = lasing_threshold_linear(new_mode, graph, D0)
+    if new_D0_method == "standard":
+        np.random.seed(42)
+
+    # the same overlapping factor is used for the threshold and the new mode
+    graph.graph["params"]["D0"] = D0
+    overlapping_factor = compute_overlapping_factor(new_mode, graph)
+    increment = lasing_threshold_linear(
+        new_mode, graph, D0, overlapping_factor=overlapping_factor
+    )
 
-        if np.abs(increment) <= D0_steps:
-            new_D0 = D0 + increment
+    if np.abs(increment) <= D0_steps:
+        new_D0 = D0 + increment
+        if new_D0_method == "first_guess":
             new_mode_state = "last_iteration"
 
-        else:
-            new_D0 = D0 + D0_steps * np.sign(increment)
+    else:
+        new_D0 = D0 + D0_steps * np.sign(increment)
 
-        new_modes_approx = pump_linear(new_mode, graph, D0, new_D0)
-        return mode_id, new_D0, new_modes_approx, new_mode_state
+    # L.debug("Mode %s at intensity %s", mode_id, new_D0)
+    new_modes_approx = pump_linear(
+        new_mode, graph, D0, new_D0, overlapping_factor=overlapping_factor
+    )
+    return mode_id, new_D0, new_modes_approx, new_mode_state
 
 
 class FindThresholdLasingModesException(Exception):
@@ -1008,32 +1070,27 @@ def find_threshold_lasing_modes(
                 for mode_id in current_modes
             )
 
+            worker_new_D0 = partial(
+                _get_new_D0,
+                graph=graph,
+                D0_steps=D0_steps,
+                new_D0_method=config["new_D0_method"],
+            )
             n_workers = graph.graph["params"]["n_workers"]
+            chunksize = max(1, int(0.1 * len(current_modes) / n_workers))
             if n_workers == 1:
                 for mode_id, new_D0, new_mode_approx, new_mode_state in map(
-                    partial(
-                        _get_new_D0,
-                        graph=graph,
-                        D0_steps=D0_steps,
-                        new_D0_method=config["new_D0_method"],
-                    ),
-                    args,
+                    worker_new_D0, args
                 ):
                     new_D0s[mode_id] = new_D0
                     new_modes_approx[mode_id] = new_mode_approx
                     mode_histories[mode_id]["state"] = new_mode_state
             else:
-                with multiprocessing.Pool(graph.graph["params"]["n_workers"]) as pool:
+                with multiprocessing.Pool(
+                    n_workers, initializer=_init_worker, initargs=(worker_new_D0,)
+                ) as pool:
                     for mode_id, new_D0, new_mode_approx, new_mode_state in tqdm(
-                        pool.imap(
-                            partial(
-                                _get_new_D0,
-                                graph=graph,
-                                D0_steps=D0_steps,
-                                new_D0_method=config["new_D0_method"],
-                            ),
-                            args,
-                        )
+                        pool.imap(_call_worker, args, chunksize=chunksize)
                     ):
                         new_D0s[mode_id] = new_D0
                         new_modes_approx[mode_id] = new_mode_approx
@@ -1057,10 +1114,12 @@ def find_threshold_lasing_modes(
             if n_workers == 1:
                 new_modes_tmp[current_modes] = list(map(worker_modes, current_modes))
             else:
-                with multiprocessing.Pool(graph.graph["params"]["n_workers"]) as pool:
+                with multiprocessing.Pool(
+                    n_workers, initializer=_init_worker, initargs=(worker_modes,)
+                ) as pool:
                     new_modes_tmp[current_modes] = list(
                         tqdm(
-                            pool.imap(worker_modes, current_modes),
+                            pool.imap(_call_worker, current_modes, chunksize=chunksize),
                             total=len(current_modes),
                         )
                     )
@@ -1156,20 +1215,26 @@ def find_threshold_lasing_modes(
                 modes_df.loc[mask[1:], "threshold_lasing_modes"] = 0.0
                 modes_df.loc[mask[1:], "lasing_thresholds"] = np.inf
 
-        return modes_df.drop(columns=["th"])
+        return modes_df.drop(columns="th", level=0)
 
     except Exception as e:
         raise FindThresholdLasingModesException(mode_histories) from e
 
 
-def lasing_threshold_linear(mode, graph, D0):
-    """Find the linear approximation of the new wavenumber."""
+def lasing_threshold_linear(mode, graph, D0, overlapping_factor=None):
+    """Find the linear approximation of the new wavenumber.
+
+    If the overlapping factor of mode at D0 is already known, it can be passed as
+    overlapping_factor to avoid solving for the mode again.
+    """
     graph.graph["params"]["D0"] = D0
+    if overlapping_factor is None:
+        overlapping_factor = compute_overlapping_factor(mode, graph)
     return 1.0 / (
         q_value(mode)
         * -1
         * np.imag(gamma(to_complex(mode), graph.graph["params"]))
-        * np.real(compute_overlapping_factor(mode, graph))
+        * np.real(overlapping_factor)
     )
 
 
@@ -84,7 +84,7 @@ def dispersion_relation_dielectric(freq, params=None):
     """
     if not params:
         raise Exception("Please provide dispersion parameters")
-    return freq * np.array(np.sqrt(params["dielectric_constant"])) / params.get("c", 1.0)
+    return freq * np.sqrt(np.asarray(params["dielectric_constant"])) / params.get("c", 1.0)
 
 
 def dispersion_relation_pump(freq, params=None):
@@ -112,10 +112,10 @@ def dispersion_relation_pump(freq, params=None):
         raise Exception("Please provide dispersion parameters")
 
     if "pump" not in params or "D0" not in params:
-        return freq * np.array(np.sqrt(params["dielectric_constant"])) / params.get("c", 1.0)
+        return freq * np.sqrt(np.asarray(params["dielectric_constant"])) / params.get("c", 1.0)
 
     return freq * np.sqrt(
-        np.array(params["dielectric_constant"]) / params.get("c", 1.0)
+        np.asarray(params["dielectric_constant"]) / params.get("c", 1.0)
         + gamma(freq, params) * params["D0"] * params["pump"]
     )
 
@@ -183,7 +183,9 @@ def update_params_dielectric_constant(graph, params):
         graph (networkx graph): current graph
         params (dict): parameters, must include 'gamma_perp' and 'k_a'
     """
-    params["dielectric_constant"] = [graph[u][v]["dielectric_constant"] for u, v in graph.edges]
+    params["dielectric_constant"] = np.array(
+        [graph[u][v]["dielectric_constant"] for u, v in graph.edges]
+    )
 
 
 def q_value(mode):
@@ -474,15 +474,27 @@ def _plot_single_mode(
 
 def plot_modes(graph, modes_df, df_entry="passive", folder="modes", ext=".png"):
     """Plot modes on the graph."""
+    is_line = graph.graph.get("name") in ("line_PRA", "line_semi")
+
+    # the figures are cleared and reused for each mode, instead of creating new ones
+    fig = plt.figure(figsize=(5, 4))
+    if is_line:
+        fig_line = plt.figure(figsize=(5, 4))
+        line_positions = _get_line_positions(graph)
     for index in tqdm(modes_df.index, total=len(modes_df)):
-        plot_single_mode(graph, modes_df, index, df_entry)
+        fig.clf()
+        plot_single_mode(graph, modes_df, index, df_entry, ax=fig.gca())
+        fig.savefig(folder + "/mode_" + str(index) + ext)
+        if is_line:
+            fig_line.clf()
+            plot_line_mode(
+                graph, modes_df, index, df_entry, ax=fig_line.gca(), line_positions=line_positions
+            )
+            fig_line.savefig(folder + "/profile_mode_" + str(index) + ext)
 
-        plt.savefig(folder + "/mode_" + str(index) + ext)
-        plt.close()
-        if "name" in graph.graph:
-            if graph.graph["name"] == "line_PRA" or graph.graph["name"] == "line_semi":
-                plot_line_mode(graph, modes_df, index, df_entry)
-                plt.savefig(folder + "/profile_mode_" + str(index) + ext)
+    plt.close(fig)
+    if is_line:
+        plt.close(fig_line)
 
 
 def plot_mode_evolution(graph, modes_df, index, folder="mode_evolution", ext=".png"):
@@ -497,8 +509,19 @@ def plot_mode_evolution(graph, modes_df, index, folder="mode_evolution", ext=".p
         plt.close()
 
 
-def plot_line_mode(graph, modes_df, index, df_entry="passive", ax=None):
-    """Plot single mode on the line."""
+def _get_line_positions(graph):
+    """Return the node order along the line and the sorted node positions."""
+    position_x = np.array([graph.nodes[u]["position"][0] for u in graph])
+    order = np.argsort(position_x)
+    return order, position_x[order] - position_x[1]
+
+
+def plot_line_mode(graph, modes_df, index, df_entry="passive", ax=None, *, line_positions=None):
+    """Plot single mode on the line.
+
+    The node order and positions from _get_line_positions can be given with line_positions, to
+    compute them only once when plotting several modes.
+    """
     if ax is None:
         plt.figure(figsize=(5, 4))
         ax = plt.gca()
@@ -510,9 +533,10 @@ def plot_line_mode(graph, modes_df, index, df_entry="passive", ax=None):
 
     node_solution = mode_on_nodes(mode, graph)
 
-    position_x = [graph.nodes[u]["position"][0] for u in graph]
-    E_sorted = node_solution[np.argsort(position_x)]
-    node_positions = np.sort(position_x - position_x[1])
+    if line_positions is None:
+        line_positions = _get_line_positions(graph)
+    order, node_positions = line_positions
+    E_sorted = node_solution[order]
     maxE2 = max(abs(E_sorted[1:-1]) ** 2)
 
     ax.plot(node_positions[1:-1], abs(E_sorted[1:-1]) ** 2 / maxE2)
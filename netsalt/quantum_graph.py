@@ -14,6 +14,9 @@ from .utils import to_complex
 
 L = logging.getLogger(__name__)
 
+# caches of graph.graph which only depend on the graph structure
+_STRUCTURE_CACHE_KEYS = ("edges", "boundary_edges", "incidence_pattern", "laplacian_pattern")
+
 
 def create_quantum_graph(
     graph, params=None, positions=None, lengths=None, seed=42, noise_level=0.001
@@ -255,7 +258,7 @@ def oversample_graph(graph, edge_size):  # pylint: disable=too-many-locals
     return oversampled_graph
 
 
-def construct_laplacian(wavenumber, graph):
+def construct_laplacian(wavenumber, graph, dtype=np.complex128):
     """Construct quantum laplacian from a graph.
 
     The quantum laplacian is L(k) = B^T(k) W^{-1}(k) B(k), with quantum incidence and weight matrix.
@@ -263,16 +266,31 @@ def construct_laplacian(wavenumber, graph):
     Args:
         wavenumber (complex): wavenumber
         graph (graph): quantum graph
+        dtype (dtype): complex dtype of the matrices (complex64 is enough for scans)
     """
     set_wavenumber(graph, wavenumber)
-    BT, B = construct_incidence_matrix(graph)
-    Winv = construct_weight_matrix(graph)
-    laplacian = BT.dot(Winv).dot(B)
+    n = len(graph.nodes)
+    indices, indptr, summation = _get_laplacian_pattern(graph)
+    b, b_out = (_data.reshape(-1, 4).T for _data in _incidence_data(graph, dtype=dtype))
+    weights = _weight_data(graph).astype(dtype)
+
+    # each edge (u, v) only has two rows in B, so it only contributes to the uu, uv, vu and vv
+    # entries of L, given by the 2x2 product of its rows in B_out^T, W^{-1} and B
+    edge_blocks = np.empty((len(weights), 4), dtype=dtype)
+    edge_blocks[:, 0] = b_out[0] * b[0] + b_out[2] * b[2]
+    edge_blocks[:, 1] = b_out[0] * b[1] + b_out[2] * b[3]
+    edge_blocks[:, 2] = b_out[1] * b[0] + b_out[3] * b[2]
+    edge_blocks[:, 3] = b_out[1] * b[1] + b_out[3] * b[3]
+    edge_blocks *= weights[:, np.newaxis]
+    laplacian = sc.sparse.csr_matrix(
+        (summation.dot(edge_blocks.ravel()), indices, indptr), shape=(n, n), dtype=dtype
+    )
+    laplacian.has_sorted_indices = True
 
     node_loss = graph.graph["params"].get("node_loss", 0)
     if node_loss > 0:
         laplacian -= node_loss * sc.sparse.diags(
-            [graph[u].get("node_loss", node_loss) for u in graph.nodes()]
+            [graph[u].get("node_loss", node_loss) for u in graph.nodes()], dtype=dtype
         )
 
     return laplacian
@@ -288,25 +306,143 @@ def set_wavenumber(graph, wavenumber):
     graph.graph["ks"] = graph.graph["dispersion_relation"](wavenumber, params=graph.graph["params"])
 
 
-def construct_incidence_matrix(graph):
-    """Construct the quantum incidence matrix B(k).
+def get_phase_factors(graph):
+    """Return exp(i L k) - 1 on each edge, shared by the incidence, weight and Z matrices.
+
+    The value is cached in graph.graph['phase_factors'] together with the lengths and ks arrays it
+    was computed from, and is recomputed as soon as one of them is replaced, for example by
+    set_wavenumber.
+
+    Args:
+        graph (graph): quantum graph
+    """
+    lengths, ks = graph.graph["lengths"], graph.graph["ks"]
+    cache = graph.graph.get("phase_factors")
+    if cache is None or cache[0] is not lengths or cache[1] is not ks:
+        cache = (lengths, ks, np.expm1(1.0j * lengths * ks))
+        graph.graph["phase_factors"] = cache
+    return cache[2]
+
+
+def _clear_structure_cache(graph):
+    """Remove the caches of graph.graph which depend on the graph structure."""
+    for key in _STRUCTURE_CACHE_KEYS:
+        graph.graph.pop(key, None)
+
+
+def get_edge_array(graph):
+    """Return the edge endpoints as an (m, 2) array, cached in graph.graph['edges'].
+
+    The cache is reset by _set_edge_lengths, so it follows the same contract as
+    graph.graph['lengths'] if the graph structure is modified.
 
     Args:
         graph (graph): quantum graph
     """
-    row = np.repeat(np.arange(len(graph.edges) * 2), 2)
-    col = np.repeat(graph.edges, 2, axis=0).flatten()
-    expl = np.exp(1.0j * graph.graph["lengths"] * graph.graph["ks"])
-    ones = np.ones(len(graph.edges))
+    edges = graph.graph.get("edges")
+    # len(graph.edges) is O(m) in networkx, so we compare with the cached lengths instead
+    if edges is None or len(edges) != len(graph.graph["lengths"]):
+        _clear_structure_cache(graph)
+        edges = np.array(graph.edges, dtype=int).reshape(len(graph.edges), 2)
+        graph.graph["edges"] = edges
+    return edges
+
+
+def get_boundary_edges(graph):
+    """Return a mask of edges with a node of degree one, cached in graph.graph['boundary_edges'].
+
+    Args:
+        graph (graph): quantum graph
+    """
+    edges = get_edge_array(graph)
+    boundary_edges = graph.graph.get("boundary_edges")
+    if boundary_edges is None:
+        deg = np.bincount(edges.flatten(), minlength=len(graph.nodes))
+        boundary_edges = np.logical_or(deg[edges[:, 0]] == 1, deg[edges[:, 1]] == 1)
+        graph.graph["boundary_edges"] = boundary_edges
+    return boundary_edges
+
+
+def _get_incidence_pattern(graph):
+    """Return the CSR indices and indptr of B, with the permutation sorting the columns of each row.
+
+    They only depend on the graph structure, so they are cached in graph.graph['incidence_pattern']
+    and shared by all the incidence matrices of a scan.
+    """
+    edges = get_edge_array(graph)
+    pattern = graph.graph.get("incidence_pattern")
+    if pattern is None:
+        m = len(edges)
+        # each row of B has exactly two entries, so the CSR structure is known without sorting
+        indptr = np.arange(0, 4 * m + 1, 2, dtype=np.int32)
+        indices = np.empty(4 * m, dtype=np.int32)
+        indices[0::2] = edges[:, 0].repeat(2)
+        indices[1::2] = edges[:, 1].repeat(2)
+
+        # swap the two entries of the rows of edges with u > v, so the column indices are sorted
+        perm = None
+        swap = np.flatnonzero(edges[:, 0] > edges[:, 1])
+        if len(swap) > 0:
+            perm = np.arange(4 * m).reshape(m, 4)
+            perm[swap] = perm[swap][:, [1, 0, 3, 2]]
+            perm = perm.flatten()
+            indices = indices[perm]
+
+        # the arrays are shared by all the returned matrices, they must not be modified in place
+        indices.flags.writeable = False
+        indptr.flags.writeable = False
+        pattern = (indices, indptr, perm)
+        graph.graph["incidence_pattern"] = pattern
+    return pattern
+
+
+def _get_laplacian_pattern(graph):
+    """Return the CSR indices and indptr of the laplacian, with the matrix summing the edge blocks.
+
+    The edge blocks of construct_laplacian always fill the same entries, so the summation matrix
+    maps them to the data array of the laplacian with a single product. They are cached in
+    graph.graph['laplacian_pattern'], and must not be modified in place.
+    """
+    edges = get_edge_array(graph)
+    pattern = graph.graph.get("laplacian_pattern")
+    if pattern is None:
+        n = len(graph.nodes)
+        m = len(edges)
+        rows = edges[:, [0, 0, 1, 1]].ravel()
+        cols = edges[:, [0, 1, 0, 1]].ravel()
+        entries, entry_ids = np.unique(rows * n + cols, return_inverse=True)
+        indices = (entries % n).astype(np.int32)
+        indptr = np.searchsorted(entries // n, np.arange(n + 1)).astype(np.int32)
+        # float32 ones keep the dtype of the edge blocks in the product
+        summation = sc.sparse.csr_matrix(
+            (np.ones(4 * m, dtype=np.float32), (entry_ids, np.arange(4 * m))),
+            shape=(len(entries), 4 * m),
+        )
+
+        indices.flags.writeable = False
+        indptr.flags.writeable = False
+        pattern = (indices, indptr, summation)
+        graph.graph["laplacian_pattern"] = pattern
+    return pattern
 
-    data = np.dstack([-ones, expl, expl, -ones])[0].flatten()
 
-    deg_u = np.array([len(graph[e[0]]) for e in graph.edges])
-    deg_v = np.array([len(graph[e[1]]) for e in graph.edges])
+def _incidence_data(graph, dtype=np.complex128):
+    """Return the entries of B and B_out, in edge order.
+
+    For an edge e = (u, v), the entries 4e to 4e + 3 are the ones at (2e, u), (2e, v), (2e + 1, u)
+    and (2e + 1, v).
+    """
+    expl = get_phase_factors(graph) + 1.0
+    m = len(expl)
+    data = np.empty(4 * m, dtype=dtype)
+    data[0::4] = -1.0
+    data[1::4] = expl
+    data[2::4] = expl
+    data[3::4] = -1.0
 
     data_out = data.copy()
     if graph.graph["params"]["open_model"] == "open":
-        mask = np.logical_or(deg_u == 1, deg_v == 1)
+        mask = get_boundary_edges(graph)
         data_out[1::4][mask] = 0
         data_out[2::4][mask] = 0
     if graph.graph["params"]["open_model"] == "directed":
@@ -315,15 +451,32 @@ def construct_incidence_matrix(graph):
     if graph.graph["params"]["open_model"] == "directed_reversed":
         data[2::4] = 0
         data[3::4] = 0
+    return data, data_out
 
-    m = len(graph.edges)
+
+def construct_incidence_matrix(graph, dtype=np.complex128):
+    """Construct the quantum incidence matrix B(k).
+
+    Args:
+        graph (graph): quantum graph
+        dtype (dtype): complex dtype of the matrices
+    """
     n = len(graph.nodes)
-    BT = sc.sparse.csr_matrix((data_out, (col, row)), shape=(n, 2 * m), dtype=np.complex128)
-    B = sc.sparse.csr_matrix((data, (row, col)), shape=(2 * m, n), dtype=np.complex128)
+    m = len(get_edge_array(graph))
+    indices, indptr, perm = _get_incidence_pattern(graph)
+    data, data_out = _incidence_data(graph, dtype=dtype)
+
+    if perm is not None:
+        data, data_out = data[perm], data_out[perm]
+
+    BT = sc.sparse.csr_matrix((data_out, indices, indptr), shape=(2 * m, n)).T
+    B = sc.sparse.csr_matrix((data, indices, indptr), shape=(2 * m, n))
+    BT.has_sorted_indices = True
+    B.has_sorted_indices = True
     return BT, B
 
 
-def construct_weight_matrix(graph, with_k=True):
+def construct_weight_matrix(graph, with_k=True, dtype=np.complex128):
     """Construct the quantum matrix W^{-1}(k).
 
     The with_k argument is needed for the graph laplcian, not for computing the edge amplitudes.
@@ -331,19 +484,21 @@ def construct_weight_matrix(graph, with_k=True):
     Args:
         graph (graph): quantum graph
         with_k (bool): multiplies or not the laplacian by k
+        dtype (dtype): complex dtype of the matrix
     """
-    data_tmp = np.zeros(len(graph.edges), dtype=np.complex128)
-    data_tmp = 1.0 / (np.exp(2.0j * graph.graph["lengths"] * graph.graph["ks"]) - 1.0)
-    if any(data_tmp > 1e5):
+    return sc.sparse.diags(np.repeat(_weight_data(graph, with_k), 2), format="csc", dtype=dtype)
+
+
+def _weight_data(graph, with_k=True):
+    """Return the diagonal of W^{-1}(k) on each edge, it is the same on both directions."""
+    # exp(2x) - 1 = (exp(x) - 1) (exp(x) + 1), without cancellation for small x
+    phase_factors = get_phase_factors(graph)
+    data_tmp = 1.0 / (phase_factors * (phase_factors + 2.0))
+    if any(abs(data_tmp) > 1e5):
         L.info("Large values in Winv, it may not work!")
     if with_k:
         data_tmp *= graph.graph["ks"]
-
-    row = np.arange(len(graph.edges) * 2)
-    data = np.repeat(data_tmp, 2)
-
-    m = len(graph.edges)
-    return sc.sparse.csc_matrix((data, (row, row)), shape=(2 * m, 2 * m), dtype=np.complex128)
+    return data_tmp
 
 
 def set_inner_edges(graph, params=None, outer_edges=None):
@@ -397,6 +552,22 @@ def _set_edge_lengths(graph, lengths=None):
             graph[u][v]["length"] = lengths[ei]
 
     graph.graph["lengths"] = np.array([graph[u][v]["length"] for u, v in graph.edges])
+    _clear_structure_cache(graph)
+
+
+def shift_invert_operator(laplacian, lu=None):
+    """Return the inverse of the laplacian as a linear operator, for shift-invert with sigma=0.
+
+    The LU factorisation is computed once here and its solve is passed as OPinv to eigs, so arpack
+    converges to the smallest eigenvalues in a few iterations.
+
+    Args:
+        laplacian (sparse matrix): laplacian matrix
+        lu (SuperLU): LU factorisation of the laplacian, if it was already computed
+    """
+    if lu is None:
+        lu = sc.sparse.linalg.splu(sc.sparse.csc_matrix(laplacian))
+    return sc.sparse.linalg.LinearOperator(laplacian.shape, matvec=lu.solve, dtype=laplacian.dtype)
 
 
 def laplacian_quality(laplacian, method="eigenvalue"):
@@ -413,7 +584,13 @@ def laplacian_quality(laplacian, method="eigenvalue"):
         try:
             return abs(
                 sc.sparse.linalg.eigs(
-                    laplacian, k=1, sigma=0, return_eigenvectors=False, which="LM", v0=v0
+                    laplacian,
+                    k=1,
+                    sigma=0,
+                    OPinv=shift_invert_operator(laplacian),
+                    return_eigenvectors=False,
+                    which="LM",
+                    v0=v0,
                 )
             )[0]
         except sc.sparse.linalg.ArpackNoConvergence:
@@ -447,13 +624,14 @@ def laplacian_quality(laplacian, method="eigenvalue"):
     return 1.0
 
 
-def mode_quality(mode, graph, quality_method="eigenvalue"):
+def mode_quality(mode, graph, quality_method="eigenvalue", dtype=np.complex128):
     """Quality of a mode, small means good quality, thus the mode is close to a correct mode.
 
     Args:
         mode (complex): complex mode
         graph (graph): quantum graph
         quality_method (str): method for quality evaluation (eig, singular value or det)
+        dtype (dtype): complex dtype of the laplacian
     """
-    laplacian = construct_laplacian(to_complex(mode), graph)
+    laplacian = construct_laplacian(to_complex(mode), graph, dtype=dtype)
     return laplacian_quality(laplacian, method=quality_method)
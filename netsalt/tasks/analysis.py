@@ -9,11 +9,10 @@ import networkx as nx
 import numpy as np
 import pandas as pd
 import seaborn as sns
-import yaml
 from matplotlib.backends.backend_pdf import PdfPages
 from matplotlib.colors import ListedColormap
 
-from netsalt.io import load_graph, load_modes, load_qualities
+from netsalt.io import load_graph, load_modes, load_pump, load_qualities
 from netsalt.plotting import (
     plot_ll_curve,
     plot_modes,
@@ -347,8 +346,8 @@ class PlotOptimizedPump(NetSaltTask):
     def run(self):
         """ """
         qg = load_graph(self.input()["graph"].path)
-        if Path(self.input()["pump"].path).suffix == ".yaml":
-            pump = yaml.safe_load(self.input()["pump"].open())
+        if Path(self.input()["pump"].path).suffix in (".yaml", ".npy"):
+            pump = load_pump(self.input()["pump"].path)
             plot_pump_profile(qg, pump)
             plt.tight_layout()
             plt.savefig(self.output().path)
@@ -419,7 +418,7 @@ class PlotPumpProfile(NetSaltTask):
     def run(self):
         """ """
         qg = self.get_graph(self.input()["graph"].path)
-        pump = yaml.safe_load(self.input()["pump"].open())
+        pump = load_pump(self.input()["pump"].path)
         plot_pump_profile(qg, pump, node_size=5)
         plt.tight_layout()
         plt.savefig(self.output().path)
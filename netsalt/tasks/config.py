@@ -13,6 +13,7 @@ class ModeSearchConfig(luigi.Config):
     alpha_n = luigi.IntParameter(default=100)
     alpha_min = luigi.FloatParameter(default=0.0)
     alpha_max = luigi.FloatParameter(default=0.1)
+    scan_dtype = luigi.ChoiceParameter(default="complex128", choices=["complex64", "complex128"])
 
     quality_threshold = luigi.FloatParameter(default=1e-3)
     max_steps = luigi.IntParameter(default=1000)
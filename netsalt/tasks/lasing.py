@@ -3,9 +3,8 @@ import pickle
 import pandas as pd
 import luigi
 import numpy as np
-import yaml
 
-from netsalt.io import load_modes, save_modes
+from netsalt.io import load_modes, load_pump, save_modes, save_pump
 from netsalt.modes import (
     compute_modal_intensities,
     compute_mode_competition_matrix,
@@ -44,16 +43,16 @@ class CreatePumpProfile(NetSaltTask):
         """ """
         if self.mode == "uniform":
             qg = self.get_graph(self.input()["graph"].path)
-            pump = np.zeros(len(qg.edges()))
-            for i, (u, v) in enumerate(qg.edges()):
-                if qg[u][v]["inner"]:
-                    pump[i] = 1
-            pump = pump.tolist()
+            pump = np.fromiter(
+                (inner for _, _, inner in qg.edges(data="inner", default=False)),
+                dtype=float,
+                count=len(qg.graph["lengths"]),
+            )
 
         elif self.mode == "optimized":
             with open(self.input()["optimize"].path, "rb") as pkl:
                 results = pickle.load(pkl)
-            pump = results["optimal_pump"].tolist()
+            pump = results["optimal_pump"]
 
         elif self.mode == "threshold":
             qg = self.get_graph(self.input()["graph"].path)
@@ -61,13 +60,11 @@ class CreatePumpProfile(NetSaltTask):
             pump = make_threshold_pump(qg, self.lasing_modes_id, modes_df)
 
         elif self.mode == "custom":
-            with open(self.custom_pump_path, "r") as yml:
-                pump = yaml.safe_load(yml)
+            pump = load_pump(self.custom_pump_path)
         else:
             raise Exception("Mode not understood")
 
-        with open(self.output().path, "w") as yml:
-            yaml.safe_dump(pump, yml)
+        save_pump(pump, self.output().path)
 
     def output(self):
         """ """
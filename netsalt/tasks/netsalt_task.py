@@ -2,10 +2,8 @@
 from pathlib import Path
 
 import luigi
-import numpy as np
-import yaml
 
-from netsalt.io import load_graph
+from netsalt.io import load_graph, load_pump
 
 from .config import ModeSearchConfig, PumpConfig
 
@@ -48,6 +46,7 @@ class NetSaltTask(luigi.Task):
                 "alpha_n": config.alpha_n,
                 "alpha_min": config.alpha_min,
                 "alpha_max": config.alpha_max,
+                "scan_dtype": config.scan_dtype,
                 "quality_threshold": config.quality_threshold,
                 "max_steps": config.max_steps,
                 "max_tries_reduction": config.max_tries_reduction,
@@ -64,7 +63,7 @@ class NetSaltTask(luigi.Task):
             {
                 "D0_max": PumpConfig().D0_max,
                 "D0_steps": PumpConfig().D0_steps,
-                "pump": np.array(yaml.full_load(self.input()["pump"].open())),
+                "pump": load_pump(self.input()["pump"].path),
             }
         )
         return qg
@@ -0,0 +1,39 @@
+"""Fixtures shared by the tests."""
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import netsalt
+from netsalt.physics import dispersion_relation_pump
+
+
+@pytest.fixture
+def quantum_graph():
+    """Create a small open line graph, with a lead on each side."""
+    graph = nx.grid_2d_graph(11, 1, periodic=False)
+    graph = nx.convert_node_labels_to_integers(graph)
+    positions = [np.array([i / (len(graph) - 1), 0]) for i in range(len(graph))]
+    params = {
+        "open_model": "open",
+        "n_workers": 1,
+        "quality_threshold": 1e-4,
+        "dielectric_params": {
+            "method": "uniform",
+            "inner_value": 3.0**2,
+            "loss": 0.0,
+            "outer_value": 1.0,
+        },
+        "k_a": 15.0,
+        "gamma_perp": 3.0,
+        "k_n": 100,
+        "k_min": 12.0,
+        "k_max": 19.0,
+        "alpha_n": 30,
+        "alpha_min": 0.0,
+        "alpha_max": 1.0,
+    }
+    netsalt.create_quantum_graph(graph, params, positions=positions, noise_level=0.0)
+    netsalt.set_dielectric_constant(graph, params)
+    netsalt.set_dispersion_relation(graph, dispersion_relation_pump)
+    return graph
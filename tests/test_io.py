@@ -0,0 +1,56 @@
+"""Test of the io module."""
+
+import luigi
+import numpy as np
+import pytest
+
+import netsalt
+from netsalt.io import load_pump, save_pump
+from netsalt.tasks.netsalt_task import NetSaltTask
+
+
+class PumpTask(NetSaltTask):
+    """Task reading the pump profile at pump_path."""
+
+    pump_path = luigi.Parameter()
+
+    def input(self):
+        """Return the pump profile target."""
+        return {"pump": luigi.LocalTarget(self.pump_path)}
+
+
+@pytest.fixture
+def pump():
+    """Create a pump profile with non integer values."""
+    return np.linspace(0.0, 1.0, 10)
+
+
+def test_load_pump(tmp_path, pump):
+    """Test that the .npy and yaml pump profiles are loaded with the same values."""
+    save_pump(pump, tmp_path / "pump.yaml")
+    save_pump(pump, tmp_path / "pump.npy")
+
+    yaml_pump = load_pump(tmp_path / "pump.yaml")
+    npy_pump = load_pump(tmp_path / "pump.npy")
+    np.testing.assert_array_equal(yaml_pump, pump)
+    np.testing.assert_array_equal(npy_pump, yaml_pump)
+    assert npy_pump.dtype == yaml_pump.dtype
+
+
+def test_get_graph_with_pump(tmp_path, quantum_graph):
+    """Test that the pump of the graph is the same with .npy and yaml pump profiles."""
+    pump = np.linspace(0.0, 1.0, len(quantum_graph.edges))
+    netsalt.save_graph(quantum_graph, tmp_path / "graph.pkl")
+    save_pump(pump, tmp_path / "pump.yaml")
+    save_pump(pump, tmp_path / "pump.npy")
+
+    yaml_graph = PumpTask(pump_path=str(tmp_path / "pump.yaml")).get_graph_with_pump(
+        tmp_path / "graph.pkl"
+    )
+    npy_graph = PumpTask(pump_path=str(tmp_path / "pump.npy")).get_graph_with_pump(
+        tmp_path / "graph.pkl"
+    )
+    np.testing.assert_array_equal(yaml_graph.graph["params"]["pump"], pump)
+    np.testing.assert_array_equal(
+        npy_graph.graph["params"]["pump"], yaml_graph.graph["params"]["pump"]
+    )
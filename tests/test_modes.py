@@ -0,0 +1,84 @@
+"""Test of the modes module."""
+
+import numpy as np
+import pytest
+
+from netsalt.algorithm import find_rough_modes_from_scan
+from netsalt.modes import (
+    _add_data_columns,
+    _init_dataframe,
+    find_modes,
+    find_threshold_lasing_modes,
+    scan_frequencies,
+)
+from netsalt.quantum_graph import mode_quality
+from netsalt.utils import get_scan_grid
+
+
+def test_scan_frequencies_complex64(quantum_graph):
+    """Test that a complex64 scan finds the same minima as a complex128 one."""
+    quantum_graph.graph["params"].update({"k_n": 40, "alpha_n": 20})
+    ks, alphas = get_scan_grid(quantum_graph)
+
+    quantum_graph.graph["params"]["scan_dtype"] = "complex128"
+    qualities = scan_frequencies(quantum_graph)
+    quantum_graph.graph["params"]["scan_dtype"] = "complex64"
+    qualities_64 = scan_frequencies(quantum_graph)
+    np.testing.assert_allclose(qualities_64, qualities, rtol=1e-4)
+
+    modes = find_rough_modes_from_scan(ks, alphas, qualities, threshold_abs=0.2)
+    modes_64 = find_rough_modes_from_scan(ks, alphas, qualities_64, threshold_abs=0.2)
+    assert len(modes) > 0
+    np.testing.assert_array_equal(modes_64, modes)
+
+    for k, alpha in modes:
+        np.testing.assert_allclose(
+            mode_quality(k - 1.0j * alpha, quantum_graph, dtype=np.complex64),
+            mode_quality(k - 1.0j * alpha, quantum_graph),
+            rtol=1e-4,
+        )
+
+
+def test_add_data_columns():
+    """Test that the data columns are replaced in a new dataframe only."""
+    modes_df = _init_dataframe()
+    modes_df["passive"] = [12.0 - 0.1j, 13.0 - 0.2j]
+    modes_df = _add_data_columns(modes_df, "mode_trajectories", {0.0: [1.0, 2.0]})
+
+    new_modes_df = _add_data_columns(
+        modes_df, "mode_trajectories", {0.0: [3.0, 4.0], 0.1: [5.0, 6.0]}
+    )
+    np.testing.assert_array_equal(modes_df["mode_trajectories"].to_numpy(), [[1.0], [2.0]])
+    np.testing.assert_array_equal(
+        new_modes_df["mode_trajectories"].to_numpy(), [[3.0, 5.0], [4.0, 6.0]]
+    )
+
+
+@pytest.mark.filterwarnings("error::pandas.errors.PerformanceWarning")
+def test_find_threshold_lasing_modes(quantum_graph):
+    """Test the threshold search on a dataframe with unsorted multi-level columns."""
+    quantum_graph.graph["params"].update(
+        {
+            "k_n": 40,
+            "alpha_n": 20,
+            "D0_max": 1.2,
+            "D0_steps": 10,
+            "search_stepsize": 0.01,
+            "max_steps": 1000,
+            "max_tries_reduction": 50,
+            "reduction_factor": 0.8,
+        }
+    )
+    pump = np.zeros(len(quantum_graph.edges))
+    pump[1 : len(pump) // 2] = 1.0
+    quantum_graph.graph["params"]["pump"] = pump
+
+    modes_df = find_modes(quantum_graph, scan_frequencies(quantum_graph), threshold_abs=0.2)
+    modes_df = _add_data_columns(
+        modes_df.head(1), "mode_trajectories", {0.0: modes_df["passive"].head(1).to_numpy()}
+    )
+
+    modes_df = find_threshold_lasing_modes(modes_df, quantum_graph)
+    assert "th" not in modes_df
+    assert "mode_trajectories" in modes_df
+    assert np.isfinite(modes_df["lasing_thresholds"].to_numpy()).all()
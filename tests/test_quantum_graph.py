@@ -0,0 +1,100 @@
+"""Test of the quantum graph module."""
+
+import networkx as nx
+import numpy as np
+import pytest
+import scipy as sc
+
+import netsalt
+from netsalt.physics import dispersion_relation_pump
+from netsalt.quantum_graph import construct_laplacian
+
+
+def _create_mixed_graph(open_model):
+    """Create a small grid graph with leads, where some edges are stored as (u, v) with u > v."""
+    grid = nx.convert_node_labels_to_integers(nx.grid_2d_graph(3, 3))
+    positions = {u: np.array([u % 3, u // 3], dtype=float) for u in grid}
+    for lead, position in [(0, [-1.0, -0.3]), (8, [3.2, 2.5])]:
+        positions[len(grid)] = np.array(position)
+        grid.add_edge(lead, len(grid))
+
+    # adding the nodes in reverse order makes networkx store the edges from the larger label
+    graph = nx.Graph()
+    graph.add_nodes_from(reversed(list(grid.nodes)))
+    graph.add_edges_from(grid.edges)
+    params = {
+        # custom outer edges only change the dielectric constant, not the laplacian
+        "open_model": "closed" if open_model == "custom" else open_model,
+        "dielectric_params": {
+            "method": "uniform",
+            "inner_value": 3.0**2,
+            "loss": 0.01,
+            "outer_value": 1.0,
+        },
+        "k_a": 15.0,
+        "gamma_perp": 3.0,
+    }
+    netsalt.create_quantum_graph(
+        graph, params, positions=[positions[u] for u in graph], noise_level=0.0
+    )
+    graph.graph["params"]["open_model"] = open_model
+    netsalt.set_dielectric_constant(graph, params)
+    netsalt.set_dispersion_relation(graph, dispersion_relation_pump)
+    return graph
+
+
+def _reference_laplacian(wavenumber, graph):
+    """Compute L = B_out^T W^{-1} B from the full incidence and weight matrices."""
+    netsalt.quantum_graph.set_wavenumber(graph, wavenumber)
+    m = len(graph.edges)
+    n = len(graph.nodes)
+    ks = graph.graph["ks"]
+    expl = np.exp(1.0j * graph.graph["lengths"] * ks)
+
+    B = np.zeros((2 * m, n), dtype=np.complex128)
+    B_out = np.zeros((2 * m, n), dtype=np.complex128)
+    for ei, (u, v) in enumerate(graph.edges):
+        B[2 * ei, [u, v]] = [-1.0, expl[ei]]
+        B[2 * ei + 1, [u, v]] = [expl[ei], -1.0]
+        B_out[2 * ei : 2 * ei + 2] = B[2 * ei : 2 * ei + 2]
+
+        open_model = graph.graph["params"]["open_model"]
+        if open_model == "open" and (len(graph[u]) == 1 or len(graph[v]) == 1):
+            B_out[2 * ei, v] = 0
+            B_out[2 * ei + 1, u] = 0
+        if open_model == "directed":
+            B_out[2 * ei + 1] = 0
+        if open_model == "directed_reversed":
+            B[2 * ei + 1] = 0
+
+    W = sc.sparse.diags(np.repeat((np.exp(2.0j * graph.graph["lengths"] * ks) - 1.0) / ks, 2))
+    return B_out.T @ sc.sparse.linalg.inv(W.tocsc()).toarray() @ B
+
+
+@pytest.mark.parametrize(
+    "open_model", ["open", "closed", "custom", "directed", "directed_reversed"]
+)
+def test_construct_laplacian(open_model):
+    """Test the laplacian assembled from edge blocks against the product of full matrices."""
+    graph = _create_mixed_graph(open_model)
+    assert any(u > v for u, v in graph.edges)
+
+    for wavenumber in [10.3 - 0.05j, 15.1 + 0.01j]:
+        np.testing.assert_allclose(
+            construct_laplacian(wavenumber, graph).toarray(),
+            _reference_laplacian(wavenumber, graph),
+            rtol=1e-10,
+            atol=1e-10,
+        )
+
+
+@pytest.mark.parametrize("node_loss", [0.0, 0.1])
+@pytest.mark.parametrize("dtype", [np.complex64, np.complex128])
+def test_construct_laplacian_dtype(quantum_graph, dtype, node_loss):
+    """Test that the laplacian keeps the requested dtype."""
+    quantum_graph.graph["params"]["node_loss"] = node_loss
+    laplacian = construct_laplacian(15.0 - 0.1j, quantum_graph, dtype=dtype)
+    assert laplacian.dtype == dtype
+
+    expected = construct_laplacian(15.0 - 0.1j, quantum_graph).toarray()
+    np.testing.assert_allclose(laplacian.toarray(), expected, rtol=1e-5, atol=1e-5)